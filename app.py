@@ -1,10 +1,13 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, render_template, jsonify, request, redirect, url_for, abort
+from collections import defaultdict
 from flask_sqlalchemy import SQLAlchemy
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
 import yfinance as yf
 import io
 import csv
+import gzip
+import json
 import pytz
 import pandas_market_calendars as mcal
 from datetime import datetime
@@ -15,10 +18,18 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///stock_data.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Initialize DB
-from models import db, Portfolio, Holding, Transaction, PortfolioHistory, StockHistory
+from models import db, Portfolio, Holding, Transaction, PortfolioHistory, StockHistory, get_portfolio
+import ledger
+import snapshots
 
 db.init_app(app)
 
+# msgpack is optional - /api/dashboard falls back to JSON without it
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 
 def is_market_open():
     nyse = mcal.get_calendar('NYSE')
@@ -34,19 +45,41 @@ def is_market_open():
 
     return market_open <= now <= market_close
 
+
+def holding_value_expr():
+    """SQL expression for a holding's total value (same fallback as the template)"""
+    return Holding.quantity * db.func.coalesce(Holding.current_price, Holding.average_buy_price)
+
+
+def selected_portfolio():
+    """Portfolio picked with ?portfolio=<id> (first portfolio if not given), 404 if unknown"""
+    portfolio = get_portfolio(request.args.get('portfolio', type=int))
+    if portfolio is None:
+        abort(404)
+    return portfolio
+
+
+def to_epoch_ms(dt):
+    """Naive local datetime -> epoch milliseconds (None stays None)"""
+    if dt is None:
+        return None
+    return int(dt.timestamp() * 1000)
+
 # --- ROUTES ---
 
 @app.route('/')
 def dashboard():
-    portfolio = Portfolio.query.first()
-    holdings = Holding.query.all()
-    # Sort by Total Value
-    holdings.sort(key=lambda h: h.quantity * (h.current_price or h.average_buy_price), reverse=True)
+    portfolio = selected_portfolio()
+    # Sort by Total Value (done in SQL)
+    holdings = Holding.query.filter(Holding.portfolio_id == portfolio.id, Holding.quantity > 0) \
+        .order_by(holding_value_expr().desc()).all()
 
-    transactions = Transaction.query.order_by(Transaction.timestamp.desc()).limit(15).all()
+    transactions = Transaction.query.filter_by(portfolio_id=portfolio.id) \
+        .order_by(Transaction.timestamp.desc()).limit(15).all()
 
     return render_template('dashboard.html',
                            portfolio=portfolio,
+                           portfolios=Portfolio.query.order_by(Portfolio.id.asc()).all(),
                            holdings=holdings,
                            transactions=transactions)
 
@@ -55,19 +88,202 @@ def dashboard():
 def manual_update():
     """Trigger manual update from the button"""
     update_market_data()
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('dashboard', portfolio=request.args.get('portfolio', type=int)))
 
 @app.route('/api/is_market_open/')
 def api_is_market_open():
     status = is_market_open()
     return jsonify({'market_open': status})
+
+
+@app.route('/api/dashboard')
+def get_dashboard_snapshot():
+    """
+    Compact snapshot of everything the dashboard shows.
+    Rows are sent as column arrays, timestamps as epoch-ms.
+    ?format=msgpack for binary (if installed), ?gzip=1 to compress.
+    ?limit=N for how many recent transactions (default 15, max 500).
+    ?portfolio=<id> to pick a portfolio (default: the first one).
+    """
+    limit = request.args.get('limit', default=15, type=int)
+    limit = max(0, min(limit, 500))  # SQLite treats LIMIT -1 as "everything"
+    fmt = request.args.get('format', default='json')
+    use_gzip = request.args.get('gzip', default=0, type=int) == 1
+
+    portfolio = selected_portfolio()
+
+    # Plain column tuples - skips building ORM objects
+    value = holding_value_expr()
+    holding_rows = db.session.query(
+        Holding.ticker,
+        Holding.quantity,
+        Holding.average_buy_price,
+        Holding.current_price,
+        Holding.previous_price,
+        value
+    ).filter(Holding.portfolio_id == portfolio.id, Holding.quantity > 0).order_by(value.desc()).all()
+
+    tx_rows = db.session.query(
+        Transaction.timestamp,
+        Transaction.ticker,
+        Transaction.transaction_type,
+        Transaction.amount_shares,
+        Transaction.price_per_share,
+        Transaction.total_value
+    ).filter(Transaction.portfolio_id == portfolio.id) \
+        .order_by(Transaction.timestamp.desc()).limit(limit).all()
+
+    # Transpose rows -> columns
+    h_cols = list(zip(*holding_rows)) or [()] * 6
+    t_cols = list(zip(*tx_rows)) or [()] * 6
+
+    assets_value = sum(h_cols[5])
+
+    payload = {
+        'portfolio': {
+            'id': portfolio.id,
+            'name': portfolio.name,
+            'cash': portfolio.cash_balance,
+            'assets': assets_value,
+            'net_worth': portfolio.total_net_worth,
+            'updated': to_epoch_ms(portfolio.last_updated)
+        },
+        'holdings': {
+            'ticker': list(h_cols[0]),
+            'qty': list(h_cols[1]),
+            'avg': list(h_cols[2]),
+            'price': list(h_cols[3]),
+            'prev': list(h_cols[4]),
+            'value': list(h_cols[5])
+        },
+        'transactions': {
+            'ts': [to_epoch_ms(ts) for ts in t_cols[0]],
+            'ticker': list(t_cols[1]),
+            'type': list(t_cols[2]),
+            'shares': list(t_cols[3]),
+            'price': list(t_cols[4]),
+            'total': list(t_cols[5])
+        }
+    }
+
+    if fmt == 'msgpack' and msgpack is not None:
+        body = msgpack.packb(payload, use_bin_type=True)
+        mimetype = 'application/msgpack'
+    else:
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        mimetype = 'application/json'
+
+    response = app.response_class(body, mimetype=mimetype)
+    if use_gzip:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@app.route('/api/orders', methods=['POST'])
+def api_submit_orders():
+    """
+    Submit one order or a list of orders as JSON:
+    {"ticker": "AAPL", "side": "BUY", "shares": 10, "price": 190.5}
+    All orders in one request succeed or fail together.
+    ?portfolio=<id> to pick a portfolio (default: the first one).
+    """
+    orders = request.get_json(silent=True)
+    if isinstance(orders, dict):
+        orders = [orders]
+    if not orders or not isinstance(orders, list):
+        return jsonify({'error': 'No orders given'}), 400
+
+    portfolio = selected_portfolio()
+    try:
+        rows = ledger.submit_orders(orders, portfolio.id)
+    except (KeyError, TypeError, ValueError) as e:
+        # Missing fields, or values like "shares": null / "price": "abc"
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'filled': len(rows),
+        'cash': portfolio.cash_balance,
+        'net_worth': portfolio.total_net_worth,
+        'realized_pnl': portfolio.realized_pnl,
+        'unrealized_pnl': portfolio.unrealized_pnl
+    })
+
+
+@app.route('/api/dividends', methods=['POST'])
+def api_pay_dividends():
+    """
+    Pay one period of dividends on every holding with a yield.
+    ?portfolio=<id> to pick a portfolio (default: the first one).
+    """
+    portfolio = selected_portfolio()
+    paid = ledger.pay_dividends(portfolio.id)
+    return jsonify({
+        'paid': paid,
+        'cash': portfolio.cash_balance,
+        'net_worth': portfolio.total_net_worth,
+        'realized_pnl': portfolio.realized_pnl
+    })
+
+
+@app.route('/api/ledger/verify')
+def api_verify_ledger():
+    """Rebuild state from the Transaction ledger and report any drift"""
+    problems = ledger.rebuild_from_ledger(selected_portfolio().id)
+    return jsonify({'ok': not problems, 'problems': problems})
+
+
+@app.route('/api/portfolio_at')
+def api_portfolio_at():
+    """
+    Holdings and value at a past time.
+    ?ts= epoch-ms (like /api/dashboard) or an ISO date string.
+    ?portfolio=<id> to pick a portfolio (default: the first one).
+    """
+    portfolio = selected_portfolio()
+    raw = request.args.get('ts', '')
+    try:
+        if raw.isdigit():
+            ts = datetime.fromtimestamp(int(raw) / 1000)
+        else:
+            ts = datetime.fromisoformat(raw.replace('Z', '+00:00'))
+    except (ValueError, OverflowError, OSError):
+        # OverflowError / OSError: epoch-ms too large for fromtimestamp()
+        return jsonify({'error': f'Bad ts: {raw!r}'}), 400
+
+    # Stored timestamps are naive local time (see to_epoch_ms)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+
+    result = snapshots.portfolio_at(ts, portfolio.id)
+    if result is None:
+        return jsonify({'error': f'Portfolio {portfolio.id} did not exist at {ts}'}), 404
+    return jsonify(result)
+
+
+@app.route('/api/portfolios')
+def api_portfolios():
+    """Every portfolio with its latest totals"""
+    return jsonify([{
+        'id': p.id,
+        'name': p.name,
+        'cash': p.cash_balance,
+        'net_worth': p.total_net_worth,
+        'updated': to_epoch_ms(p.last_updated)
+    } for p in Portfolio.query.order_by(Portfolio.id.asc()).all()])
+
+
 @app.route('/api/history')
 def get_history_data():
     """
     Returns Portfolio History (Total Net Worth).
     FILTER: Returns only 1 data point per hour to keep graph clean.
+    ?portfolio=<id> to pick a portfolio (default: the first one).
     """
-    history = PortfolioHistory.query.order_by(PortfolioHistory.date.asc()).all()
+    portfolio = selected_portfolio()
+    # Served by the (portfolio_id, date) index
+    history = PortfolioHistory.query.filter_by(portfolio_id=portfolio.id) \
+        .order_by(PortfolioHistory.date.asc()).all()
 
     hourly_data = {}
     for h in history:
@@ -160,60 +376,82 @@ def get_timestamps_csv():
 # --- AUTOMATION ---
 
 def update_market_data():
+    """
+    One tick for ALL portfolios: each unique ticker is fetched and stored
+    in StockHistory once, then its price is fanned out to every holding.
+    """
     if is_market_open():
         with app.app_context():
             print(f"[{datetime.now()}] 🔄 Scanning Market...")
-            portfolio = Portfolio.query.first()
-            holdings = Holding.query.all()
+            portfolios = Portfolio.query.all()
+            # Closed (zero-quantity) positions don't need prices
+            holdings = Holding.query.filter(Holding.quantity > 0).all()
 
             if not holdings: return
 
-            # Fetch Live Data
-            tickers_list = [h.ticker for h in holdings]
+            # Fetch Live Data (union of tickers across portfolios)
+            tickers_list = sorted({h.ticker for h in holdings})
             try:
                 ticker_str = " ".join(tickers_list)
                 data = yf.Tickers(ticker_str)
 
-                current_assets_value = 0.0
                 timestamp = datetime.now()
+                prices = {}
 
-                for h in holdings:
+                for ticker in tickers_list:
                     try:
                         # Get new price
-                        new_price = data.tickers[h.ticker].fast_info['last_price']
+                        new_price = data.tickers[ticker].fast_info['last_price']
 
                         if new_price:
-                            # Save old price to 'previous' before overwriting
-                            if h.current_price:
-                                h.previous_price = h.current_price
-                            else:
-                                h.previous_price = h.average_buy_price
-
-                            h.current_price = new_price
+                            prices[ticker] = new_price
 
                             # Add to StockHistory
-                            sh = StockHistory(timestamp=timestamp, ticker=h.ticker, price=new_price)
+                            sh = StockHistory(timestamp=timestamp, ticker=ticker, price=new_price)
                             db.session.add(sh)
-
-                            current_assets_value += (new_price * h.quantity)
                     except Exception as e:
-                        print(f"   ⚠️ Error {h.ticker}: {e}")
-                        current_assets_value += (h.current_price * h.quantity)
-
-                # Update Portfolio
-                portfolio.total_net_worth = portfolio.cash_balance + current_assets_value
-                portfolio.last_updated = timestamp
-
-                # Save Portfolio History
-                ph = PortfolioHistory(
-                    date=timestamp,
-                    cash_balance=portfolio.cash_balance,
-                    assets_value=current_assets_value,
-                    total_value=portfolio.total_net_worth
-                )
-                db.session.add(ph)
+                        print(f"   ⚠️ Error {ticker}: {e}")
+
+                assets_value = defaultdict(float)
+                unrealized_pnl = defaultdict(float)
+
+                for h in holdings:
+                    new_price = prices.get(h.ticker)
+                    if new_price:
+                        # Save old price to 'previous' before overwriting
+                        if h.current_price:
+                            h.previous_price = h.current_price
+                        else:
+                            h.previous_price = h.average_buy_price
+
+                        h.current_price = new_price
+
+                    price = h.current_price or h.average_buy_price
+                    assets_value[h.portfolio_id] += price * h.quantity
+                    unrealized_pnl[h.portfolio_id] += (price - h.average_buy_price) * h.quantity
+
+                for portfolio in portfolios:
+                    # Update Portfolio
+                    portfolio.total_net_worth = portfolio.cash_balance + assets_value[portfolio.id]
+                    portfolio.unrealized_pnl = unrealized_pnl[portfolio.id]
+                    portfolio.last_updated = timestamp
+
+                    # Save Portfolio History
+                    ph = PortfolioHistory(
+                        portfolio_id=portfolio.id,
+                        date=timestamp,
+                        cash_balance=portfolio.cash_balance,
+                        assets_value=assets_value[portfolio.id],
+                        total_value=portfolio.total_net_worth
+                    )
+                    db.session.add(ph)
+
+                # Daily checkpoint for /api/portfolio_at
+                snapshots.checkpoint_if_due(timestamp)
                 db.session.commit()
-                print(f"✅ Update Complete. Net Worth: ${portfolio.total_net_worth:,.2f}")
+                print(f"✅ Update Complete. {len(tickers_list)} tickers -> {len(portfolios)} portfolios.")
+                for portfolio in portfolios:
+                    print(f"   - {portfolio.name}: ${portfolio.total_net_worth:,.2f}")
 
             except Exception as e:
                 print(f"❌ Critical Update Error: {e}")
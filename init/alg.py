@@ -1,5 +1,6 @@
 import pandas as pd
 import yfinance as yf
+from fundamentals import get_fundamentals, dividend_yield
 import random
 import os
 
@@ -43,6 +44,8 @@ def solve_weighted_csv():
     # 3. Fetch Live Data
     try:
         yf_tickers = yf.Tickers(' '.join(tickers))
+        # Dividend yields come from the shared fundamentals cache
+        infos = get_fundamentals(tickers)
         data_list = []
 
         for index, row in input_df.iterrows():
@@ -52,12 +55,8 @@ def solve_weighted_csv():
                 # Get Market Price
                 price = yf_tickers.tickers[sym].fast_info['last_price']
                 
-                # Try to get dividend yield
-                try:
-                    info = yf_tickers.tickers[sym].info
-                    div = info.get('dividendYield', 0)
-                except:
-                    div = 0
+                # Dividend yield (0 if the cache has nothing)
+                div = dividend_yield(infos.get(sym))
 
                 data_list.append({
                     'SYMBOL': sym,
@@ -1,5 +1,6 @@
 import pandas as pd
 import math
+from fundamentals import get_fundamentals, dividend_yield
 
 # 1. The List of 20 Winners
 TARGET_TICKERS = [
@@ -23,6 +24,14 @@ def generate_final_csv(input_csv, output_csv):
     TOTAL_CAPITAL = 500000.00
     TARGET_PER_STOCK = TOTAL_CAPITAL / len(TARGET_TICKERS)  # $25,000
 
+    # Refresh dividend yields from the shared fundamentals cache
+    infos = get_fundamentals(df['SYMBOL'].tolist())
+    # Same rule as alg.py - unknown yields fall back to the CSV value, then 0
+    df['Dividend_Yield'] = [
+        dividend_yield(infos.get(sym), old if pd.notna(old) else 0)
+        for sym, old in zip(df['SYMBOL'], df['Dividend_Yield'])
+    ]
+
     print(f"Allocating ${TARGET_PER_STOCK:,.2f} to each of the {len(df)} stocks...")
 
     # Calculate Shares and Totals
@@ -0,0 +1,119 @@
+import yfinance as yf
+import sqlite3
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# --- CONFIGURATION ---
+CACHE_FILE = "fundamentals.db"
+CACHE_TTL = 24 * 60 * 60  # Seconds before a symbol's .info is fetched again
+REQUESTS_PER_SECOND = 2.0  # Sustained rate allowed against the API
+BURST = 5  # Requests allowed back-to-back before the rate kicks in
+WORKERS = 4
+
+
+class TokenBucket:
+    """
+    Classic token bucket: refills at `rate` tokens/sec up to `capacity`.
+    acquire() only waits when the bucket is empty, so we run at the max
+    allowed rate instead of sleeping a fixed time after every call.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _connect(cache_file):
+    conn = sqlite3.connect(cache_file)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fundamentals (
+            symbol TEXT PRIMARY KEY,
+            fetched_at REAL NOT NULL,
+            info TEXT NOT NULL
+        )
+    """)
+    return conn
+
+
+def _read_cache(conn, symbols, ttl):
+    """{symbol: info} for every symbol fetched within ttl seconds"""
+    cutoff = time.time() - ttl
+    cached = {}
+    # Chunk to stay under SQLite's bound-parameter limit
+    for i in range(0, len(symbols), 500):
+        chunk = symbols[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT symbol, info FROM fundamentals WHERE fetched_at >= ? AND symbol IN ({marks})",
+            [cutoff, *chunk]
+        )
+        for sym, info in rows:
+            cached[sym] = json.loads(info)
+    return cached
+
+
+def _fetch_one(sym, bucket):
+    bucket.acquire()
+    return yf.Ticker(sym).info
+
+
+def get_fundamentals(symbols, ttl=CACHE_TTL, rate=REQUESTS_PER_SECOND, burst=BURST,
+                     workers=WORKERS, cache_file=CACHE_FILE):
+    """
+    Returns {symbol: yfinance .info dict}.
+    Fresh symbols come from the SQLite cache; the rest are fetched in
+    parallel under a shared token bucket and written back to the cache.
+    Symbols that fail to fetch are left out of the result.
+    """
+    symbols = list(dict.fromkeys(symbols))  # De-dupe, keep order
+    conn = _connect(cache_file)
+    result = _read_cache(conn, symbols, ttl)
+
+    missing = [s for s in symbols if s not in result]
+    if missing:
+        print(f"Fundamentals: {len(result)} cached, fetching {len(missing)} at up to {rate}/sec...")
+        bucket = TokenBucket(rate, burst)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_fetch_one, sym, bucket): sym for sym in missing}
+            for future in as_completed(futures):
+                sym = futures[future]
+                try:
+                    info = future.result()
+                except Exception as e:
+                    print(f"Could not fetch {sym}: {e}")
+                    continue
+
+                result[sym] = info
+                conn.execute(
+                    "INSERT OR REPLACE INTO fundamentals (symbol, fetched_at, info) VALUES (?, ?, ?)",
+                    (sym, time.time(), json.dumps(info, default=str))
+                )
+                conn.commit()
+    else:
+        print(f"Fundamentals: all {len(result)} symbols served from cache.")
+
+    conn.close()
+    return result
+
+
+def dividend_yield(info, default=0):
+    """dividendYield from an .info dict (yfinance may send None) -> default when unknown"""
+    return (info or {}).get('dividendYield') or default
@@ -1,6 +1,5 @@
 import pandas as pd
-import yfinance as yf
-import time
+from fundamentals import get_fundamentals, dividend_yield
 
 
 def fetch_metrics(input_csv, output_csv):
@@ -15,35 +14,29 @@ def fetch_metrics(input_csv, output_csv):
         return
 
     print(f"Gathering deep metrics for {len(symbols)} stocks... please wait.")
-    print("This may take 30-60 seconds to avoid rate limits.\n")
+    print("Cached symbols are instant; new ones are rate limited.\n")
 
-    data_list = []
+    # 2. Fetch data (cache first, token bucket for the rest)
+    infos = get_fundamentals(symbols)
 
-    # 2. Fetch data
+    data_list = []
     for sym in symbols:
-        try:
-            print(f"Fetching: {sym}...")
-            ticker = yf.Ticker(sym)
-            info = ticker.info
-
-            # Extract key metrics safely (handle missing data with defaults)
-            data_list.append({
-                'SYMBOL': sym,
-                'Current_Price': info.get('currentPrice', 0),
-                'Market_Cap': info.get('marketCap', 0),
-                'PE_Ratio': info.get('trailingPE', 0),
-                'Dividend_Yield': info.get('dividendYield', 0),  # 0.05 = 5%
-                'Beta': info.get('beta', 1.0),  # Volatility (1.0 is market avg)
-                '52W_High': info.get('fiftyTwoWeekHigh', 0),
-                '52W_Low': info.get('fiftyTwoWeekLow', 0),
-                'Profit_Margin': info.get('profitMargins', 0)
-            })
-
-            # Sleep briefly to be nice to the API
-            time.sleep(0.5)
-
-        except Exception as e:
-            print(f"Could not fetch {sym}: {e}")
+        info = infos.get(sym)
+        if info is None:
+            continue
+
+        # Extract key metrics safely (handle missing data with defaults)
+        data_list.append({
+            'SYMBOL': sym,
+            'Current_Price': info.get('currentPrice', 0),
+            'Market_Cap': info.get('marketCap', 0),
+            'PE_Ratio': info.get('trailingPE', 0),
+            'Dividend_Yield': dividend_yield(info),  # 0.05 = 5%
+            'Beta': info.get('beta', 1.0),  # Volatility (1.0 is market avg)
+            '52W_High': info.get('fiftyTwoWeekHigh', 0),
+            '52W_Low': info.get('fiftyTwoWeekLow', 0),
+            'Profit_Margin': info.get('profitMargins', 0)
+        })
 
     # 3. Save to new CSV
     metrics_df = pd.DataFrame(data_list)
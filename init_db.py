@@ -1,6 +1,8 @@
 import pandas as pd
 from app import app, db, Portfolio, Holding, Transaction, PortfolioHistory
+import snapshots
 import os
+import sys
 from datetime import datetime
 
 # CONFIGURATION
@@ -9,91 +11,123 @@ DB_FILE = "stock_data.db"
 FEE_PER_TRANSACTION = 10.00  # <--- FLAT FEE PER STOCK BOUGHT
 
 
-def init_database():
+def add_portfolio(csv_file, name=None):
+    """
+    Build one portfolio from a CSV (SYMBOL, PRICEPER, AMOUNT, TOTAL, DIVIDEND).
+    Must run inside an app context. Name defaults to the CSV file name.
+    """
+    name = name or os.path.splitext(os.path.basename(csv_file))[0]
+
+    if not os.path.exists(csv_file):
+        print(f"❌ CRITICAL ERROR: {csv_file} not found!")
+        return None
+
+    try:
+        df = pd.read_csv(csv_file)
+        df.columns = df.columns.str.strip()
+        print(f"📂 Loaded {len(df)} rows from {csv_file}.")
+    except Exception as e:
+        print(f"❌ Error reading CSV: {e}")
+        return None
+
+    # --- CALCULATE TOTALS ---
+    total_assets_value = df['TOTAL'].sum()
+
+    # New Fee Logic: $10 per Ticker (per row in CSV)
+    total_fees_paid = len(df) * FEE_PER_TRANSACTION
+
+    target_investment = 500000.00
+    cost_basis = total_assets_value + total_fees_paid
+    cash_balance = target_investment - cost_basis
+
+    # Net Worth = Assets + Cash (Fees are gone/spent)
+    starting_net_worth = total_assets_value + cash_balance
+
+    # --- CREATE PORTFOLIO ---
+    p = Portfolio(
+        name=name,
+        cash_balance=cash_balance,
+        total_net_worth=starting_net_worth,
+        realized_pnl=0.0,
+        unrealized_pnl=0.0,
+        last_updated=datetime.now()
+    )
+    db.session.add(p)
+    db.session.flush()  # Need p.id for the rows below
+    print(f"💰 Portfolio '{name}' (id {p.id}) initialized.")
+    print(f"   - Assets:   ${total_assets_value:,.2f}")
+    print(f"   - Fees Pd:  ${total_fees_paid:,.2f} ({len(df)} trades)")
+    print(f"   - Cash:     ${cash_balance:.2f}")
+
+    # --- PROCESS HOLDINGS ---
+    for _, row in df.iterrows():
+        ticker = row['SYMBOL']
+        qty = int(row['AMOUNT'])
+        price = float(row['PRICEPER'])
+        total_val = float(row['TOTAL'])
+        div_yield = float(row['DIVIDEND'])
+
+        h = Holding(
+            portfolio_id=p.id,
+            ticker=ticker,
+            quantity=qty,
+            average_buy_price=price,
+            current_price=price,
+            dividend_yield=div_yield
+        )
+        db.session.add(h)
+
+        t = Transaction(
+            portfolio_id=p.id,
+            ticker=ticker,
+            transaction_type="BUY (INIT)",
+            amount_shares=qty,
+            price_per_share=price,
+            total_value=total_val,
+            timestamp=datetime.now()
+        )
+        db.session.add(t)
+
+    # --- INITIAL HISTORY ---
+    hist = PortfolioHistory(
+        portfolio_id=p.id,
+        date=datetime.now(),
+        cash_balance=cash_balance,
+        assets_value=total_assets_value,
+        total_value=starting_net_worth
+    )
+    db.session.add(hist)
+
+    db.session.commit()
+
+    # First checkpoint - taken after the INIT trades so replays start here
+    snapshots.create_checkpoint(p)
+    db.session.commit()
+    return p
+
+
+def init_database(csv_files=None, keep_existing=False):
+    """
+    Build the database with one portfolio per CSV.
+    keep_existing=True adds the portfolios to the current database instead of wiping it.
+    """
+    csv_files = csv_files or [CSV_FILE]
     print("🚀 Starting Database Initialization...")
 
-    if os.path.exists(DB_FILE):
+    if os.path.exists(DB_FILE) and not keep_existing:
         print(f"⚠️  Found existing {DB_FILE}. Deleting it...")
         os.remove(DB_FILE)
 
     with app.app_context():
         db.create_all()
-        
-        if not os.path.exists(CSV_FILE):
-            print(f"❌ CRITICAL ERROR: {CSV_FILE} not found!")
-            return
-
-        try:
-            df = pd.read_csv(CSV_FILE)
-            df.columns = df.columns.str.strip()
-            print(f"📂 Loaded {len(df)} rows from {CSV_FILE}.")
-        except Exception as e:
-            print(f"❌ Error reading CSV: {e}")
-            return
-
-        # --- CALCULATE TOTALS ---
-        total_assets_value = df['TOTAL'].sum()
-        
-        # New Fee Logic: $10 per Ticker (per row in CSV)
-        total_fees_paid = len(df) * FEE_PER_TRANSACTION
-        
-        target_investment = 500000.00
-        cost_basis = total_assets_value + total_fees_paid
-        cash_balance = target_investment - cost_basis
-        
-        # Net Worth = Assets + Cash (Fees are gone/spent)
-        starting_net_worth = total_assets_value + cash_balance
-
-        # --- CREATE PORTFOLIO ---
-        p = Portfolio(
-            cash_balance=cash_balance,
-            total_net_worth=starting_net_worth,
-            last_updated=datetime.now()
-        )
-        db.session.add(p)
-        print(f"💰 Portfolio initialized.")
-        print(f"   - Assets:   ${total_assets_value:,.2f}")
-        print(f"   - Fees Pd:  ${total_fees_paid:,.2f} ({len(df)} trades)")
-        print(f"   - Cash:     ${cash_balance:.2f}")
-
-        # --- PROCESS HOLDINGS ---
-        for _, row in df.iterrows():
-            ticker = row['SYMBOL']
-            qty = int(row['AMOUNT'])
-            price = float(row['PRICEPER'])
-            total_val = float(row['TOTAL'])
-            div_yield = float(row['DIVIDEND'])
-
-            h = Holding(
-                ticker=ticker,
-                quantity=qty,
-                average_buy_price=price,
-                current_price=price,
-                dividend_yield=div_yield
-            )
-            db.session.add(h)
-
-            t = Transaction(
-                ticker=ticker,
-                transaction_type="BUY (INIT)",
-                amount_shares=qty,
-                price_per_share=price,
-                total_value=total_val,
-                timestamp=datetime.now()
-            )
-            db.session.add(t)
-
-        # --- INITIAL HISTORY ---
-        hist = PortfolioHistory(
-            date=datetime.now(),
-            cash_balance=cash_balance,
-            assets_value=total_assets_value,
-            total_value=starting_net_worth
-        )
-        db.session.add(hist)
 
-        db.session.commit()
-        print(f"✨ SUCCESS! Database built.")
+        built = [p for p in (add_portfolio(f) for f in csv_files) if p is not None]
+        if built:
+            print(f"✨ SUCCESS! Database built with {len(built)} portfolio(s).")
+
 
 if __name__ == "__main__":
-    init_database()
+    # Usage: python init_db.py [--add] [portfolio.csv ...]
+    args = sys.argv[1:]
+    keep = "--add" in args
+    init_database([a for a in args if a != "--add"], keep_existing=keep)
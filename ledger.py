@@ -0,0 +1,378 @@
+from models import db, Portfolio, Holding, Transaction, get_portfolio
+from types import SimpleNamespace
+from datetime import datetime
+import math
+import random
+import time
+
+# CONFIGURATION
+STARTING_CAPITAL = 500000.00
+FEE_PER_TRANSACTION = 10.00  # Same flat fee init_db.py charges per ticker
+DIVIDENDS_PER_YEAR = 4  # Quarterly payouts
+
+BUY = "BUY"
+SELL = "SELL"
+DIVIDEND = "DIVIDEND"
+INIT_BUY = "BUY (INIT)"
+
+
+# --- CORE MATH ---
+# Every function here is O(1): it only touches one position and the portfolio
+# totals. They work on ORM rows or on plain SimpleNamespace objects, so the
+# live path and rebuild_from_ledger() share the exact same logic.
+
+def _mark(h):
+    """Price used to value a position (same fallback as the dashboard)"""
+    return h.current_price or h.average_buy_price
+
+
+def _unrealized(h):
+    return h.quantity * (_mark(h) - h.average_buy_price)
+
+
+def _market_value(h):
+    return h.quantity * _mark(h)
+
+
+def apply_buy(portfolio, h, shares, price, fee=FEE_PER_TRANSACTION):
+    """Add shares at price. Average cost excludes the fee (like init_db.py)."""
+    cost = shares * price + fee
+    if cost > portfolio.cash_balance:
+        raise ValueError(f"Not enough cash to buy {shares} {h.ticker} (${cost:,.2f})")
+
+    old_unrealized = _unrealized(h)
+    old_value = _market_value(h)
+
+    total_qty = h.quantity + shares
+    h.average_buy_price = (h.quantity * h.average_buy_price + shares * price) / total_qty
+    # Opening (or reopening a closed row) marks the position at the trade price
+    if h.quantity == 0 or h.current_price is None:
+        h.current_price = price
+    h.quantity = total_qty
+
+    portfolio.cash_balance -= cost
+    portfolio.realized_pnl -= fee
+    portfolio.unrealized_pnl += _unrealized(h) - old_unrealized
+    portfolio.total_net_worth += _market_value(h) - old_value - cost
+    return cost
+
+
+def apply_sell(portfolio, h, shares, price, fee=FEE_PER_TRANSACTION):
+    """Remove shares at price. Realized P&L is measured against average cost."""
+    if shares > h.quantity:
+        raise ValueError(f"Cannot sell {shares} {h.ticker}, only hold {h.quantity}")
+
+    old_unrealized = _unrealized(h)
+    old_value = _market_value(h)
+
+    proceeds = shares * price - fee
+    h.quantity -= shares
+
+    portfolio.cash_balance += proceeds
+    portfolio.realized_pnl += shares * (price - h.average_buy_price) - fee
+    portfolio.unrealized_pnl += _unrealized(h) - old_unrealized
+    portfolio.total_net_worth += _market_value(h) - old_value + proceeds
+    return proceeds
+
+
+def apply_dividend(portfolio, h, per_share):
+    """Pay per_share cash on every share held"""
+    payout = h.quantity * per_share
+    portfolio.cash_balance += payout
+    portfolio.realized_pnl += payout
+    portfolio.total_net_worth += payout
+    return payout
+
+
+def dividend_per_share(h, periods_per_year=DIVIDENDS_PER_YEAR):
+    """
+    One payout period's dividend per share.
+    Holding.dividend_yield comes from yfinance as a percent (0.55 = 0.55%).
+    """
+    return _mark(h) * (h.dividend_yield or 0.0) / 100.0 / periods_per_year
+
+
+# --- LEDGER API ---
+
+def _load_positions(portfolio_id, tickers):
+    """One query for every holding a batch touches -> {ticker: Holding}"""
+    if not tickers:
+        return {}
+    rows = Holding.query.filter(Holding.portfolio_id == portfolio_id, Holding.ticker.in_(tickers)).all()
+    return {h.ticker: h for h in rows}
+
+
+def _new_holding(portfolio_id, ticker, price, dividend_yield=None):
+    if dividend_yield is None:
+        # Reuse the yield another portfolio already knows for this ticker
+        dividend_yield = db.session.query(Holding.dividend_yield) \
+            .filter(Holding.ticker == ticker, Holding.dividend_yield > 0).limit(1).scalar() or 0.0
+    h = Holding(portfolio_id=portfolio_id, ticker=ticker, quantity=0, average_buy_price=price,
+                current_price=None, previous_price=None, dividend_yield=dividend_yield)
+    db.session.add(h)
+    return h
+
+
+def _require_portfolio(portfolio_id):
+    portfolio = get_portfolio(portfolio_id)
+    if portfolio is None:
+        raise ValueError(f"No portfolio {portfolio_id or ''} - run init_db.py first")
+    return portfolio
+
+
+def submit_orders(orders, portfolio_id=None, fee=FEE_PER_TRANSACTION):
+    """
+    Apply many orders to one portfolio in ONE database transaction.
+    orders: list of dicts {'ticker', 'side' ('BUY'/'SELL'), 'shares', 'price'}
+            BUY orders may also carry 'dividend_yield' (percent, like yfinance).
+    portfolio_id: defaults to the first portfolio.
+    Closed positions stay as zero-quantity rows so their dividend_yield survives a rebuy.
+    If any order fails, nothing is saved.
+    Returns the list of Transaction rows written (as dicts).
+    """
+    for o in orders:
+        if not isinstance(o, dict) or not isinstance(o.get('side'), str) or not isinstance(o.get('ticker'), str):
+            raise ValueError(f"Bad order (needs string 'ticker' and 'side'): {o!r}")
+
+    portfolio = _require_portfolio(portfolio_id)
+
+    positions = _load_positions(portfolio.id, {o['ticker'] for o in orders})
+    timestamp = datetime.now()
+    rows = []
+
+    try:
+        for o in orders:
+            ticker = o['ticker']
+            side = o['side'].upper()
+            raw_shares = float(o['shares'])
+            price = float(o['price'])
+            # Whole, positive shares and a real positive price (rejects 1.9 shares, NaN, inf)
+            if not raw_shares.is_integer() or raw_shares <= 0 or not math.isfinite(price) or price <= 0:
+                raise ValueError(f"Bad order for {ticker}: {o['shares']} @ {o['price']}")
+            shares = int(raw_shares)
+
+            h = positions.get(ticker)
+            if side == BUY:
+                div_yield = o.get('dividend_yield')
+                if div_yield is not None:
+                    div_yield = float(div_yield)
+                    if not math.isfinite(div_yield) or div_yield < 0:
+                        raise ValueError(f"Bad dividend_yield for {ticker}: {o['dividend_yield']}")
+                if h is None:
+                    h = positions[ticker] = _new_holding(portfolio.id, ticker, price, div_yield)
+                elif div_yield is not None:
+                    h.dividend_yield = div_yield
+                total = apply_buy(portfolio, h, shares, price, fee)
+            elif side == SELL:
+                if h is None:
+                    raise ValueError(f"Cannot sell {ticker}, not held")
+                total = apply_sell(portfolio, h, shares, price, fee)
+            else:
+                raise ValueError(f"Unknown order side: {side}")
+
+            rows.append({
+                'portfolio_id': portfolio.id,
+                'timestamp': timestamp,
+                'ticker': ticker,
+                'transaction_type': side,
+                'amount_shares': shares,
+                'price_per_share': price,
+                'total_value': total
+            })
+
+        if rows:
+            # executemany insert - much faster than one ORM object per trade
+            db.session.execute(db.insert(Transaction), rows)
+        portfolio.last_updated = timestamp
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return rows
+
+
+def buy(ticker, shares, price, portfolio_id=None, fee=FEE_PER_TRANSACTION):
+    order = {'ticker': ticker, 'side': BUY, 'shares': shares, 'price': price}
+    return submit_orders([order], portfolio_id, fee)[0]
+
+
+def sell(ticker, shares, price, portfolio_id=None, fee=FEE_PER_TRANSACTION):
+    order = {'ticker': ticker, 'side': SELL, 'shares': shares, 'price': price}
+    return submit_orders([order], portfolio_id, fee)[0]
+
+
+def pay_dividends(portfolio_id=None, periods_per_year=DIVIDENDS_PER_YEAR):
+    """
+    Credit one period of dividends for every holding with a yield.
+    Returns the total cash paid.
+    """
+    portfolio = _require_portfolio(portfolio_id)
+
+    timestamp = datetime.now()
+    rows = []
+    paid = 0.0
+
+    for h in Holding.query.filter(Holding.portfolio_id == portfolio.id, Holding.quantity > 0,
+                                  Holding.dividend_yield > 0).all():
+        per_share = dividend_per_share(h, periods_per_year)
+        payout = apply_dividend(portfolio, h, per_share)
+        if payout <= 0:
+            continue
+        paid += payout
+        rows.append({
+            'portfolio_id': portfolio.id,
+            'timestamp': timestamp,
+            'ticker': h.ticker,
+            'transaction_type': DIVIDEND,
+            'amount_shares': h.quantity,
+            'price_per_share': per_share,
+            'total_value': payout
+        })
+
+    if rows:
+        db.session.execute(db.insert(Transaction), rows)
+    portfolio.last_updated = timestamp
+    db.session.commit()
+    return paid
+
+
+# --- VERIFICATION ---
+
+def replay(transactions, starting_capital=STARTING_CAPITAL, fee=FEE_PER_TRANSACTION, prices=None, start=None):
+    """
+    Fold a list of Transaction rows (oldest first) into state.
+    prices: optional {ticker: price} used to mark positions.
+    start: optional (portfolio, positions) to continue from (e.g. a checkpoint)
+           instead of an empty portfolio holding starting_capital.
+    Returns (portfolio, {ticker: position}) as SimpleNamespace objects.
+    """
+    prices = prices or {}
+    if start is not None:
+        portfolio, positions = start
+    else:
+        portfolio = SimpleNamespace(cash_balance=starting_capital, total_net_worth=starting_capital,
+                                    realized_pnl=0.0, unrealized_pnl=0.0)
+        positions = {}
+
+    for t in transactions:
+        h = positions.get(t.ticker)
+        if h is None and t.transaction_type in (BUY, INIT_BUY):
+            h = positions[t.ticker] = SimpleNamespace(
+                ticker=t.ticker, quantity=0, average_buy_price=t.price_per_share, current_price=None)
+        if h is None:
+            raise ValueError(f"Ledger {t.transaction_type} for {t.ticker} with no position")
+
+        if t.transaction_type == INIT_BUY:
+            # init_db.py pays the fee but does not book it as P&L
+            apply_buy(portfolio, h, t.amount_shares, t.price_per_share, fee)
+            portfolio.realized_pnl += fee
+        elif t.transaction_type == BUY:
+            apply_buy(portfolio, h, t.amount_shares, t.price_per_share, t.total_value - t.amount_shares * t.price_per_share)
+        elif t.transaction_type == SELL:
+            apply_sell(portfolio, h, t.amount_shares, t.price_per_share, t.amount_shares * t.price_per_share - t.total_value)
+        elif t.transaction_type == DIVIDEND:
+            apply_dividend(portfolio, h, t.total_value / t.amount_shares if t.amount_shares else 0.0)
+
+        if h.quantity == 0:
+            del positions[t.ticker]
+
+    # Re-mark with the requested prices
+    for h in positions.values():
+        if h.ticker in prices:
+            old_unrealized = _unrealized(h)
+            old_value = _market_value(h)
+            h.current_price = prices[h.ticker]
+            portfolio.unrealized_pnl += _unrealized(h) - old_unrealized
+            portfolio.total_net_worth += _market_value(h) - old_value
+
+    return portfolio, positions
+
+
+def rebuild_from_ledger(portfolio_id=None, starting_capital=STARTING_CAPITAL, fee=FEE_PER_TRANSACTION,
+                        tolerance=0.01):
+    """
+    Replay one portfolio's Transactions from scratch and compare with the live tables.
+    Returns a list of mismatch strings (empty list = ledger and state agree).
+    """
+    live = _require_portfolio(portfolio_id)
+    # Closed positions stay as zero-quantity rows (to keep their dividend yield)
+    live_holdings = {h.ticker: h for h in Holding.query.filter(Holding.portfolio_id == live.id,
+                                                               Holding.quantity > 0).all()}
+    prices = {t: h.current_price for t, h in live_holdings.items() if h.current_price}
+    transactions = Transaction.query.filter_by(portfolio_id=live.id) \
+        .order_by(Transaction.timestamp.asc(), Transaction.id.asc()).all()
+
+    rebuilt, positions = replay(transactions, starting_capital, fee, prices)
+    problems = []
+
+    if abs(rebuilt.cash_balance - live.cash_balance) > tolerance:
+        problems.append(f"cash: ledger ${rebuilt.cash_balance:,.2f} vs live ${live.cash_balance:,.2f}")
+    if abs(rebuilt.realized_pnl - live.realized_pnl) > tolerance:
+        problems.append(f"realized P&L: ledger ${rebuilt.realized_pnl:,.2f} vs live ${live.realized_pnl:,.2f}")
+
+    for ticker in set(positions) | set(live_holdings):
+        r = positions.get(ticker)
+        h = live_holdings.get(ticker)
+        if r is None or h is None:
+            problems.append(f"{ticker}: only in {'live' if r is None else 'ledger'}")
+        elif r.quantity != h.quantity:
+            problems.append(f"{ticker}: qty ledger {r.quantity} vs live {h.quantity}")
+        elif abs(r.average_buy_price - h.average_buy_price) > tolerance:
+            problems.append(f"{ticker}: avg ledger {r.average_buy_price:.4f} vs live {h.average_buy_price:.4f}")
+
+    # Both sides are marked at the live prices, so valuations must match too
+    if abs(rebuilt.unrealized_pnl - live.unrealized_pnl) > tolerance:
+        problems.append(f"unrealized P&L: ledger ${rebuilt.unrealized_pnl:,.2f} vs live ${live.unrealized_pnl:,.2f}")
+    if abs(rebuilt.total_net_worth - live.total_net_worth) > tolerance:
+        problems.append(f"net worth: ledger ${rebuilt.total_net_worth:,.2f} vs live ${live.total_net_worth:,.2f}")
+
+    return problems
+
+
+# --- BENCHMARK ---
+
+def benchmark(num_trades=5000, batch_size=500):
+    """Random buys/sells against a throwaway in-memory database"""
+    from flask import Flask
+
+    bench_app = Flask(__name__)
+    bench_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    bench_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(bench_app)
+
+    tickers = [f"T{i:03d}" for i in range(50)]
+
+    with bench_app.app_context():
+        db.create_all()
+        db.session.add(Portfolio(name="Bench", cash_balance=1e9, total_net_worth=1e9,
+                                 realized_pnl=0.0, unrealized_pnl=0.0))
+        db.session.commit()
+
+        held = {t: 0 for t in tickers}
+        orders = []
+        for _ in range(num_trades):
+            t = random.choice(tickers)
+            price = round(random.uniform(10, 500), 2)
+            if held[t] > 10 and random.random() < 0.4:
+                qty = random.randint(1, held[t])
+                held[t] -= qty
+                orders.append({'ticker': t, 'side': SELL, 'shares': qty, 'price': price})
+            else:
+                qty = random.randint(1, 100)
+                held[t] += qty
+                orders.append({'ticker': t, 'side': BUY, 'shares': qty, 'price': price})
+
+        start = time.perf_counter()
+        for i in range(0, len(orders), batch_size):
+            submit_orders(orders[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+
+        problems = rebuild_from_ledger(starting_capital=1e9)
+
+    print(f"⏱️  {num_trades} trades in {elapsed:.3f}s ({num_trades / elapsed:,.0f} trades/sec, batch={batch_size})")
+    print("✅ Ledger rebuild matches." if not problems else f"❌ Rebuild mismatches: {problems[:5]}")
+
+
+if __name__ == "__main__":
+    benchmark()
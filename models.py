@@ -5,12 +5,17 @@ db = SQLAlchemy()
 
 class Portfolio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, default="Main")
     cash_balance = db.Column(db.Float, default=0.00)
     total_net_worth = db.Column(db.Float, default=500000.00)
+    realized_pnl = db.Column(db.Float, default=0.0)
+    unrealized_pnl = db.Column(db.Float, default=0.0)
     last_updated = db.Column(db.DateTime, default=datetime.now)
 
 class Holding(db.Model):
-    ticker = db.Column(db.String(10), primary_key=True)
+    # One row per (portfolio, ticker) - the same ticker can sit in many portfolios
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), primary_key=True)
+    ticker = db.Column(db.String(10), primary_key=True, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     average_buy_price = db.Column(db.Float, nullable=False)
     current_price = db.Column(db.Float, nullable=True)
@@ -19,6 +24,7 @@ class Holding(db.Model):
 
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.now)
     ticker = db.Column(db.String(10), nullable=True)
     transaction_type = db.Column(db.String(20), nullable=False)
@@ -26,16 +32,55 @@ class Transaction(db.Model):
     price_per_share = db.Column(db.Float, nullable=True)
     total_value = db.Column(db.Float, nullable=False)
 
+    # Per-portfolio time range scans (ledger replay, recent transactions)
+    __table_args__ = (db.Index('ix_transaction_portfolio_timestamp', 'portfolio_id', 'timestamp'),)
+
 class PortfolioHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
     date = db.Column(db.DateTime, default=datetime.now)
     cash_balance = db.Column(db.Float)
     assets_value = db.Column(db.Float)
     total_value = db.Column(db.Float)
 
+    # Each portfolio's history is read on its own, in date order
+    __table_args__ = (db.Index('ix_portfolio_history_portfolio_date', 'portfolio_id', 'date'),)
+
 # NEW TABLE: Tracks every stock's price at every snapshot
+# Shared by all portfolios - each ticker is stored once per tick
 class StockHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.now)
     ticker = db.Column(db.String(10))
-    price = db.Column(db.Float)
\ No newline at end of file
+    price = db.Column(db.Float)
+
+    # Range scans by time for point-in-time price lookups
+    __table_args__ = (db.Index('ix_stock_history_timestamp_ticker', 'timestamp', 'ticker'),)
+
+# Checkpoints: full copy of the portfolio every so often, so rebuilding
+# "the portfolio at time T" only replays what happened after the checkpoint
+class PortfolioCheckpoint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.now)
+    cash_balance = db.Column(db.Float)
+    realized_pnl = db.Column(db.Float, default=0.0)
+    holdings = db.relationship('CheckpointHolding', backref='checkpoint', lazy='select',
+                               cascade='all, delete-orphan')
+
+    __table_args__ = (db.Index('ix_portfolio_checkpoint_portfolio_timestamp', 'portfolio_id', 'timestamp'),)
+
+class CheckpointHolding(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    checkpoint_id = db.Column(db.Integer, db.ForeignKey('portfolio_checkpoint.id'), nullable=False, index=True)
+    ticker = db.Column(db.String(10), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    average_buy_price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=True)
+
+
+def get_portfolio(portfolio_id=None):
+    """Portfolio by id, or the first (default) portfolio when no id is given"""
+    if portfolio_id is not None:
+        return db.session.get(Portfolio, portfolio_id)
+    return Portfolio.query.order_by(Portfolio.id.asc()).first()
\ No newline at end of file
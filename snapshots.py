@@ -0,0 +1,124 @@
+from models import db, Portfolio, Holding, Transaction, StockHistory, PortfolioCheckpoint, CheckpointHolding, \
+    get_portfolio
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+import ledger
+
+# CONFIGURATION
+CHECKPOINT_INTERVAL = timedelta(days=1)  # How often update_market_data() saves a checkpoint
+
+
+def create_checkpoint(portfolio, timestamp=None):
+    """Copy one portfolio + its holdings into a new checkpoint (caller commits)"""
+    cp = PortfolioCheckpoint(
+        portfolio_id=portfolio.id,
+        timestamp=timestamp or datetime.now(),
+        cash_balance=portfolio.cash_balance,
+        realized_pnl=portfolio.realized_pnl or 0.0
+    )
+    for h in Holding.query.filter(Holding.portfolio_id == portfolio.id, Holding.quantity > 0).all():
+        cp.holdings.append(CheckpointHolding(
+            ticker=h.ticker,
+            quantity=h.quantity,
+            average_buy_price=h.average_buy_price,
+            price=h.current_price
+        ))
+    db.session.add(cp)
+    return cp
+
+
+def checkpoint_if_due(timestamp=None):
+    """Checkpoint every portfolio whose newest checkpoint is older than CHECKPOINT_INTERVAL"""
+    timestamp = timestamp or datetime.now()
+
+    # Newest checkpoint per portfolio in one grouped query
+    latest = dict(db.session.query(PortfolioCheckpoint.portfolio_id, db.func.max(PortfolioCheckpoint.timestamp))
+                  .group_by(PortfolioCheckpoint.portfolio_id).all())
+
+    created = []
+    for portfolio in Portfolio.query.all():
+        last = latest.get(portfolio.id)
+        if last is None or timestamp - last >= CHECKPOINT_INTERVAL:
+            created.append(create_checkpoint(portfolio, timestamp))
+    return created
+
+
+def _latest_prices(tickers, after, until):
+    """
+    Last StockHistory price per ticker in (after, until].
+    Only scans rows since the checkpoint, not the whole table.
+    """
+    query = db.session.query(StockHistory.ticker, StockHistory.price).filter(
+        StockHistory.timestamp <= until,
+        StockHistory.ticker.in_(tickers)
+    )
+    if after is not None:
+        query = query.filter(StockHistory.timestamp > after)
+
+    prices = {}
+    # Ascending order -> later rows overwrite earlier ones
+    for ticker, price in query.order_by(StockHistory.timestamp.asc()):
+        if price:
+            prices[ticker] = price
+    return prices
+
+
+def portfolio_at(ts, portfolio_id=None):
+    """
+    Rebuild one portfolio's holdings and value as of datetime ts.
+    Cost = one checkpoint load + the transactions and prices since it.
+    Returns a dict ready for jsonify, or None if the portfolio does not
+    exist or ts is before its first checkpoint and first transaction.
+    """
+    portfolio = get_portfolio(portfolio_id)
+    if portfolio is None:
+        return None
+
+    cp = PortfolioCheckpoint.query.filter(PortfolioCheckpoint.portfolio_id == portfolio.id,
+                                          PortfolioCheckpoint.timestamp <= ts) \
+        .order_by(PortfolioCheckpoint.timestamp.desc()).first()
+
+    tx_query = Transaction.query.filter(Transaction.portfolio_id == portfolio.id, Transaction.timestamp <= ts)
+    if cp is not None:
+        positions = {
+            ch.ticker: SimpleNamespace(ticker=ch.ticker, quantity=ch.quantity,
+                                       average_buy_price=ch.average_buy_price, current_price=ch.price)
+            for ch in cp.holdings
+        }
+        assets = sum(h.quantity * (h.current_price or h.average_buy_price) for h in positions.values())
+        unrealized = sum(h.quantity * ((h.current_price or h.average_buy_price) - h.average_buy_price)
+                         for h in positions.values())
+        start = (SimpleNamespace(cash_balance=cp.cash_balance, total_net_worth=cp.cash_balance + assets,
+                                 realized_pnl=cp.realized_pnl or 0.0, unrealized_pnl=unrealized), positions)
+        tx_query = tx_query.filter(Transaction.timestamp > cp.timestamp)
+    else:
+        start = None
+
+    transactions = tx_query.order_by(Transaction.timestamp.asc(), Transaction.id.asc()).all()
+    if cp is None and not transactions:
+        # Nothing to rebuild from - the portfolio did not exist yet
+        return None
+    state, positions = ledger.replay(transactions, start=start)
+
+    prices = _latest_prices(list(positions), cp.timestamp if cp else None, ts) if positions else {}
+    state, positions = ledger.replay([], prices=prices, start=(state, positions))
+
+    holdings = sorted(positions.values(), key=lambda h: h.quantity * (h.current_price or h.average_buy_price),
+                      reverse=True)
+    return {
+        'portfolio_id': portfolio.id,
+        'ts': int(ts.timestamp() * 1000),
+        'checkpoint': int(cp.timestamp.timestamp() * 1000) if cp else None,
+        'replayed_transactions': len(transactions),
+        'cash': state.cash_balance,
+        'net_worth': state.total_net_worth,
+        'realized_pnl': state.realized_pnl,
+        'unrealized_pnl': state.unrealized_pnl,
+        'holdings': {
+            'ticker': [h.ticker for h in holdings],
+            'qty': [h.quantity for h in holdings],
+            'avg': [h.average_buy_price for h in holdings],
+            'price': [h.current_price for h in holdings],
+            'value': [h.quantity * (h.current_price or h.average_buy_price) for h in holdings]
+        }
+    }